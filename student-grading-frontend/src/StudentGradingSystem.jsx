@@ -2,6 +2,25 @@ import React, { useState, useRef } from 'react';
 import { Upload, Download, CheckCircle, AlertCircle, FileText, Loader2, X, BarChart3, ListOrdered } from 'lucide-react';
 import { BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer, LabelList } from 'recharts';
 
+// How long to keep retrying a download the server is still generating (202)
+const DOWNLOAD_READY_TIMEOUT_MS = 60 * 1000;
+
+// Fetches a download, retrying while the server answers 202 (file still being generated),
+// honouring Retry-After; gives up with an error once DOWNLOAD_READY_TIMEOUT_MS has passed.
+const fetchWhenReady = async (url) => {
+    const deadline = Date.now() + DOWNLOAD_READY_TIMEOUT_MS;
+    let response = await fetch(url);
+    while (response.status === 202) {
+        const retryAfterMs = (Number(response.headers.get('Retry-After')) || 1) * 1000;
+        if (Date.now() + retryAfterMs > deadline) {
+            throw new Error('The file is taking too long to generate. Please try again shortly.');
+        }
+        await new Promise(resolve => setTimeout(resolve, retryAfterMs));
+        response = await fetch(url);
+    }
+    return response;
+};
+
 
 const StudentGradingSystem = () => {
     const [selectedFile, setSelectedFile] = useState(null);
@@ -159,7 +178,8 @@ const StudentGradingSystem = () => {
     const handleDownload = async () => {
         if (!downloadInfo) return showNotification('No file available for download.', 'error');
         try {
-            const response = await fetch(`http://localhost:5000/download/${downloadInfo.fileId}`);
+            // Waits out the 202s while the Excel file is still being generated
+            const response = await fetchWhenReady(`http://localhost:5000/download/${downloadInfo.fileId}`);
             if (!response.ok) throw new Error('Download failed from server.');
             const blob = await response.blob();
             const url = window.URL.createObjectURL(blob);
@@ -181,8 +201,8 @@ const StudentGradingSystem = () => {
         if (!downloadInfo) return showNotification('No file available for PDF download.', 'error');
         try {
             // ⭐ Call the new backend endpoint
-            const response = await fetch(`http://localhost:5000/download-pdf/${downloadInfo.fileId}`); 
-            
+            const response = await fetchWhenReady(`http://localhost:5000/download-pdf/${downloadInfo.fileId}`);
+
             if (!response.ok) {
                 const errorResult = await response.json();
                 throw new Error(errorResult.error || 'PDF download failed from server.');
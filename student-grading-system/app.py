@@ -1,80 +1,176 @@
 from flask import Flask, request, jsonify, send_file
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
 import pandas as pd
 import numpy as np
 import io
+import xlsxwriter
+import diskcache
+import orjson
+import decimal
 from werkzeug.utils import secure_filename
 import os
-import uuid
+import secrets
 import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # --- PDF Imports ---
 from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, KeepTogether
+from reportlab.platypus import SimpleDocTemplate, Table, LongTable, TableStyle, Paragraph, Spacer, KeepTogether
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib import colors
 from reportlab.lib.units import inch
 from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT 
 # -------------------
 
+# --- Excel Reader Engine ---
+# calamine (Rust) parses .xlsx/.xls far faster than openpyxl; fall back to
+# pandas' default engine selection when it is not installed.
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_READ_ENGINE = 'calamine'
+except ImportError:
+    EXCEL_READ_ENGINE = None
+# ---------------------------
+
+# --- JSON Serialization ---
+def orjson_default(obj):
+    """Encodes the few types orjson does not handle natively (e.g. pandas Timestamp, Decimal)."""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+class ORJSONProvider(JSONProvider):
+    """
+    Flask JSON provider backed by orjson (C encoder). NumPy scalars/arrays are
+    serialized natively and NaN is emitted as null.
+    """
+    options = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=orjson_default, option=self.options).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Hand orjson's bytes straight to the response, skipping the str round-trip
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, default=orjson_default, option=self.options),
+                                        mimetype='application/json')
+# --------------------------
+
 app = Flask(__name__)
-CORS(app)
+app.json = ORJSONProvider(app)
+# The frontend runs on another origin; expose Retry-After so its 202 polling can read it
+CORS(app, expose_headers=['Retry-After'])
 
 # --- Configuration ---
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+# Holds pickled student records; defaults to the app's instance folder, not a shared temp path
+PROCESSED_FILES_DIR = os.environ.get('GRADING_CACHE_DIR', os.path.join(app.instance_path, 'processed_files'))
+PROCESSED_FILES_SIZE_LIMIT = 512 * 1024 * 1024  # 512MB on disk, LRU-evicted beyond this
+PROCESSED_FILE_TTL = 60 * 60  # seconds a processed upload stays downloadable
+EXPORT_PENDING_TTL = 5 * 60  # upper bound on a background workbook encode
+EXCEL_SHEET_STUDENT_ROWS = 250_000  # students per sheet; larger rosters continue on further sheets
 
 # --- Constants ---
 GRADE_POINTS_MAP = {'O': 10, 'A+': 9, 'A': 8, 'B+': 7, 'B': 6, 'C': 5, 'U': 0}
 
+# Accepted headers for the student name column, in order of preference
+NAME_COLUMN_CANDIDATES = ('Name', 'Student Name', 'Student', 'name')
+
+# Grade column categories, ordered lowest to highest so grades compare naturally
+# (e.g. Grade >= 'B'), and the points for each category code in the same order
+GRADE_CATEGORIES = pd.CategoricalDtype(sorted(GRADE_POINTS_MAP, key=GRADE_POINTS_MAP.get), ordered=True)
+POINTS_BY_CODE = np.array([GRADE_POINTS_MAP[g] for g in GRADE_CATEGORIES.categories], dtype=np.int8)
+LABELS_BY_CODE = GRADE_CATEGORIES.categories.to_numpy(dtype=object)
+
+# Grades from highest to lowest points, the order the summaries list them in
+SORTED_GRADES = tuple(sorted(GRADE_POINTS_MAP, key=GRADE_POINTS_MAP.__getitem__, reverse=True))
+
+# Passing grades in ascending order and their category codes (shared by both grading schemes)
+PASS_GRADE_LABELS = np.array(['C', 'B', 'B+', 'A', 'A+', 'O'], dtype=object)
+PASS_GRADE_CODES = GRADE_CATEGORIES.categories.get_indexer(PASS_GRADE_LABELS).astype(np.int8)
+FAIL_GRADE_CODE = np.int8(GRADE_CATEGORIES.categories.get_loc('U'))
+
+# Fixed grading: lower bound (inclusive) of each passing grade, ascending
+FIXED_GRADE_BINS = np.array([50, 56, 61, 71, 81, 91], dtype=np.float64)
+
 # --- Global State ---
-processed_files = {}
-grade_cutoffs = None
+def private_cache_dir(path):
+    """
+    Creates the cache directory readable by this user only (0700) and refuses one that
+    is a symlink or owned by someone else: the cache unpickles what it finds there.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.lstat(path)
+    if os.path.islink(path) or (hasattr(os, 'getuid') and st.st_uid != os.getuid()):
+        raise RuntimeError(f"Refusing to use cache directory {path}: not a directory owned by this user")
+    if st.st_mode & 0o077:
+        os.chmod(path, 0o700)
+    return path
+
+# Disk-backed, bounded store of processed uploads. Keys are (file_id, kind) tuples
+# ('meta', 'xlsx', 'pdf' and their '.pending' markers), so a client-supplied
+# file_id string can never name a derived entry
+processed_files = diskcache.Cache(private_cache_dir(PROCESSED_FILES_DIR), size_limit=PROCESSED_FILES_SIZE_LIMIT,
+                                  eviction_policy='least-recently-used')
+
+# Background workbook/PDF encoding; futures are per-process, keyed by cache key
+export_executor = ThreadPoolExecutor(max_workers=4)
+pending_exports = {}
+
+# --- Grading Logic ---
+def _grade_from_clean_array(arr):
+    """
+    Fixed-scheme grade codes for marks already known to be passing (>= 50, no NaN).
+    """
+    return PASS_GRADE_CODES[np.searchsorted(FIXED_GRADE_BINS[1:], arr, side='right')]
 
-# --- Grading Logic (Unmodified) ---
 def apply_fixed_grading(marks):
     """
     Apply fixed grading scheme based on absolute marks for <= 30 students.
+    Takes a float array of marks and returns their GRADE_CATEGORIES codes (int8).
     """
-    def get_grade(mark):
-        if pd.isna(mark) or mark < 50: return 'U'
-        if mark >= 91: return 'O'
-        if mark >= 81: return 'A+'
-        if mark >= 71: return 'A'
-        if mark >= 61: return 'B+'
-        if mark >= 56: return 'B'
-        if mark >= 50: return 'C'
-        return 'U'
-    
-    grades = marks.apply(get_grade)
-    return grades
+    arr = np.asarray(marks, dtype=np.float64)
+
+    # Below 50 and missing marks both fall to 'U'; emit category codes
+    # directly so no per-row label strings are materialized
+    passed_mask = arr >= 50  # NaN compares False
+    codes = np.full(len(arr), FAIL_GRADE_CODE, dtype=np.int8)
+    codes[passed_mask] = _grade_from_clean_array(arr[passed_mask])
+    return codes
 
 def apply_relative_grading(marks):
     """
     Apply relative grading for > 30 students to achieve a bell-curve distribution.
     This is applied ONLY to students who have passed (marks >= 50).
+    Takes a float array of marks and returns (GRADE_CATEGORIES codes, cutoffs);
+    cutoffs is None when fixed grading was used instead.
     """
-    global grade_cutoffs
-    
-    final_grades = pd.Series('U', index=marks.index)
+    # Passed grade codes are scattered back by mask
+    arr = np.asarray(marks, dtype=np.float64)
+    final_codes = np.full(len(arr), FAIL_GRADE_CODE, dtype=np.int8)
     
-    passed_mask = (marks >= 50) & marks.notna()
-    passed_marks = marks[passed_mask]
+    passed_mask = arr >= 50  # NaN compares False
+    passed_marks = arr[passed_mask]
     
-    if passed_marks.empty:
-        grade_cutoffs = None
-        return final_grades
+    if passed_marks.size == 0:
+        return final_codes, None
     
-    if passed_marks.nunique() < 2:
-        passed_grades = apply_fixed_grading(passed_marks)
-        final_grades.update(passed_grades)
-        grade_cutoffs = None
-        return final_grades
+    # Fewer than two distinct marks <=> min == max (no sort/hash needed)
+    if passed_marks.min() == passed_marks.max():
+        final_codes[passed_mask] = _grade_from_clean_array(passed_marks)
+        return final_codes, None
     
     try:
         # --- Use raw marks directly for relative grading ---
         mean = passed_marks.mean()
-        std_dev = passed_marks.std()
+        std_dev = passed_marks.std(ddof=1)
 
         if std_dev == 0:
             raise ValueError("Standard deviation is zero, cannot apply relative grading.")
@@ -86,7 +182,7 @@ def apply_relative_grading(marks):
         b_plus_cutoff = mean - 0.9 * std_dev
         b_cutoff      = mean - 1.8 * std_dev
 
-        # Store cutoffs globally for grade range calculation
+        # Returned with the grades for grade range calculation
         grade_cutoffs = {
             'o_cutoff': o_cutoff,
             'a_plus_cutoff': a_plus_cutoff,
@@ -95,33 +191,24 @@ def apply_relative_grading(marks):
             'b_cutoff': b_cutoff
         }
 
-        # Assign Grades using explicit ranges for a proper bell curve
-        conditions = [
-            (passed_marks >= o_cutoff),
-            (passed_marks >= a_plus_cutoff),
-            (passed_marks >= a_cutoff),
-            (passed_marks >= b_plus_cutoff),
-            (passed_marks >= b_cutoff),
-        ]
-        grade_choices = ['O', 'A+', 'A', 'B+', 'B']
+        # Assign Grades by bucketing against the ascending cutoffs in a single pass
+        cuts = np.array([b_cutoff, b_plus_cutoff, a_cutoff, a_plus_cutoff, o_cutoff])
 
-        passed_grades = pd.Series(np.select(conditions, grade_choices, default='C'), index=passed_marks.index)
-        final_grades.update(passed_grades)
+        idx = np.searchsorted(cuts, passed_marks, side='right')
+        final_codes[passed_mask] = PASS_GRADE_CODES[idx]
 
     except Exception as e:
         print(f"Relative grading failed: {e}. Falling back to fixed grading.")
-        passed_grades = apply_fixed_grading(passed_marks)
-        final_grades.update(passed_grades)
+        final_codes[passed_mask] = _grade_from_clean_array(passed_marks)
         grade_cutoffs = None
 
-    return final_grades
+    return final_codes, grade_cutoffs
 
-def calculate_continuous_grade_ranges(df, grading_method):
+def calculate_continuous_grade_ranges(grading_method, grade_cutoffs=None):
     """
     Calculates continuous mark ranges for each grade based on cutoffs, which are
     used for documentation in the output Excel sheet and PDF.
     """
-    global grade_cutoffs
     grade_ranges = {}
     
     if grading_method == 'relative_grading' and grade_cutoffs is not None:
@@ -178,41 +265,124 @@ def calculate_continuous_grade_ranges(df, grading_method):
     
     return grade_ranges
 
+# --- Export Column Store ---
+def columns_from_frame(df):
+    """
+    Splits a DataFrame into an ordered {column name: ndarray} dict, the form the Excel
+    and PDF builders and the cache work with. Numeric, bool and plain object columns
+    are taken as-is; other dtypes (categorical, datetime) become object arrays of their
+    scalar values, so grades stay labels and dates stay Timestamps.
+    """
+    columns = {}
+    for name, col in df.items():
+        if col.dtype.kind in 'iufbO' and not isinstance(col.dtype, pd.api.extensions.ExtensionDtype):
+            columns[name] = col.to_numpy()
+        else:
+            columns[name] = col.astype(object).to_numpy()
+    return columns
+
+# --- PDF Styles ---
+# Built once at import and only read while rendering, so concurrent renders can share them.
+# Dedicated styles derived from the sample sheet rather than edits to its shared entries.
+PDF_STYLES = getSampleStyleSheet()
+PDF_NORMAL = PDF_STYLES['Normal']
+PDF_H1 = ParagraphStyle('ReportHeading1', parent=PDF_STYLES['Heading1'], fontSize=14, alignment=TA_CENTER)
+PDF_H2 = ParagraphStyle('ReportHeading2', parent=PDF_STYLES['Heading2'], fontSize=10, alignment=TA_CENTER)
+PDF_BOLD_LEFT = ParagraphStyle('BoldLeft', parent=PDF_NORMAL, fontName='Helvetica-Bold', fontSize=10, alignment=TA_LEFT)
+PDF_NORMAL_LEFT = ParagraphStyle('NormalLeft', parent=PDF_NORMAL, fontName='Helvetica', fontSize=10, alignment=TA_LEFT)
+PDF_NORMAL_RIGHT = ParagraphStyle('NormalRight', parent=PDF_NORMAL, fontName='Helvetica', fontSize=10, alignment=TA_RIGHT)
+PDF_SIGNATURE = ParagraphStyle('Signature', parent=PDF_NORMAL, fontName='Helvetica-Bold', fontSize=10, alignment=TA_CENTER)
+
+# Table styles are likewise fixed and only read when a table is laid out
+
+# Course details block: borderless label/value grid
+PDF_DETAIL_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('ALIGN', (4, 0), (4, 0), 'RIGHT'),
+    ('LEFTPADDING', (0, 0), (-1, -1), 0),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('SPAN', (3, 1), (4, 1)),
+    ('SPAN', (3, 2), (4, 2)),
+    ('SPAN', (3, 3), (4, 3)),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+    ('TOPPADDING', (0, 0), (-1, -1), 4),
+])
+
+# Student results table
+PDF_RESULTS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#003366')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 8),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.black)
+])
+
+# Grading summary table
+PDF_SUMMARY_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#6699CC')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#E0E0E0')),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.black)
+])
+
+# Signatories block
+PDF_SIGNATURE_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('TOPPADDING', (0, 1), (-1, 1), 0),
+    ('BOTTOMPADDING', (0, 1), (-1, 1), 0),
+])
+
 # --- PDF Generation Logic (MODIFIED for column removal and layout) ---
-def generate_pdf_from_data(df_export, summary_stats, academic_details, grade_point_map):
+def format_pdf_cell(item):
+    """Formats one table cell: blank for missing, whole numbers without decimals, others to 2 places."""
+    if pd.isna(item):
+        return ''
+    if isinstance(item, (int, float)):
+        return str(int(item) if item == int(item) else round(item, 2))
+    return str(item)
+
+def format_pdf_column(values):
+    """Formats a whole column (ndarray) for the PDF results table, same output as format_pdf_cell."""
+    kind = values.dtype.kind
+    if kind in 'iub':
+        # No missing values possible; bools print as 1/0 like other numbers
+        return values.astype(np.int64).astype(str).tolist()
+    if kind == 'f':
+        return ['' if v != v else str(int(v)) if v.is_integer() else str(round(v, 2))
+                for v in values.astype(np.float64).tolist()]
+    return [format_pdf_cell(item) for item in values.tolist()]
+
+def generate_pdf_from_data(columns, summary_stats, academic_details):
     """
-    Generates a PDF byte stream from the processed DataFrame and summary data,
+    Generates a PDF from the processed columns and summary data,
     with improved alignment, spacing, and a flexible signature block.
+    Returns the BytesIO it was rendered into, rewound to the start.
     """
     buffer = io.BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=letter,
                             leftMargin=0.5*inch, rightMargin=0.5*inch,
                             topMargin=0.5*inch, bottomMargin=0.5*inch)
-    styles = getSampleStyleSheet()
     Story = []
     
-    # --- Styles and Date ---
-    h1 = styles['Heading1']
-    h1.fontSize = 14
-    h1.alignment = TA_CENTER
-    h2 = styles['Heading2']
-    h2.fontSize = 10
-    h2.alignment = TA_CENTER
-    
-    # Custom styles
-    bold_left = ParagraphStyle('BoldLeft', parent=styles['Normal'], fontName='Helvetica-Bold', fontSize=10, alignment=TA_LEFT)
-    normal_left = ParagraphStyle('NormalLeft', parent=styles['Normal'], fontName='Helvetica', fontSize=10, alignment=TA_LEFT)
-    normal_right = ParagraphStyle('NormalRight', parent=styles['Normal'], fontName='Helvetica', fontSize=10, alignment=TA_RIGHT)
-    sig_style = ParagraphStyle('Signature', parent=styles['Normal'], fontName='Helvetica-Bold', fontSize=10, alignment=TA_CENTER)
-
     # Current Date
     current_date = datetime.now().strftime("%d-%b-%Y")
     # -----------------------
 
     # --- 1. Institutional Header ---
-    Story.append(Paragraph('NATIONAL ENGINEERING COLLEGE, K.R. NAGAR, KOVILPATTI – 628 503', h1))
-    Story.append(Paragraph('(An Autonomous Institution Affiliated to Anna University, Chennai)', h2))
-    Story.append(Paragraph('NPTEL - Grade Fixing', h2))
+    Story.append(Paragraph('NATIONAL ENGINEERING COLLEGE, K.R. NAGAR, KOVILPATTI – 628 503', PDF_H1))
+    Story.append(Paragraph('(An Autonomous Institution Affiliated to Anna University, Chennai)', PDF_H2))
+    Story.append(Paragraph('NPTEL - Grade Fixing', PDF_H2))
     Story.append(Spacer(1, 0.2 * inch))
 
     # --- 2. Course Details (Redesigned 5-Column Table) ---
@@ -220,19 +390,19 @@ def generate_pdf_from_data(df_export, summary_stats, academic_details, grade_poi
     
     details_data = [
         [
-            Paragraph("Academic Year", bold_left), ':', Paragraph(academic_details['academic_year'], normal_left), 
-            Paragraph("Date", bold_left), Paragraph(current_date, normal_right)
+            Paragraph("Academic Year", PDF_BOLD_LEFT), ':', Paragraph(academic_details['academic_year'], PDF_NORMAL_LEFT), 
+            Paragraph("Date", PDF_BOLD_LEFT), Paragraph(current_date, PDF_NORMAL_RIGHT)
         ],
         [
-            Paragraph("Subject Code", bold_left), ':', Paragraph(academic_details['subject_code'], normal_left), 
+            Paragraph("Subject Code", PDF_BOLD_LEFT), ':', Paragraph(academic_details['subject_code'], PDF_NORMAL_LEFT), 
             '', ''
         ],
         [
-            Paragraph("Subject Name", bold_left), ':', Paragraph(academic_details['subject_name'], normal_left), 
+            Paragraph("Subject Name", PDF_BOLD_LEFT), ':', Paragraph(academic_details['subject_name'], PDF_NORMAL_LEFT), 
             '', ''
         ],
         [
-            Paragraph("Total Number of Students", bold_left), ':', Paragraph(str(academic_details['expected_total_students']), normal_left), 
+            Paragraph("Total Number of Students", PDF_BOLD_LEFT), ':', Paragraph(str(academic_details['expected_total_students']), PDF_NORMAL_LEFT), 
             '', ''
         ]
     ]
@@ -241,43 +411,21 @@ def generate_pdf_from_data(df_export, summary_stats, academic_details, grade_poi
     detail_col_widths = [total_width * 0.25, total_width * 0.01, total_width * 0.38, total_width * 0.10, total_width * 0.26]
     detail_table = Table(details_data, colWidths=detail_col_widths)
 
-    detail_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'), 
-        ('ALIGN', (4, 0), (4, 0), 'RIGHT'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 0),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('SPAN', (3, 1), (4, 1)),
-        ('SPAN', (3, 2), (4, 2)),
-        ('SPAN', (3, 3), (4, 3)),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-        ('TOPPADDING', (0, 0), (-1, -1), 4),
-    ]))
+    detail_table.setStyle(PDF_DETAIL_TABLE_STYLE)
     
     Story.append(detail_table)
     Story.append(Spacer(1, 0.2 * inch))
     
     # --- 3. Student Results Table (MODIFIED: Remove Grade_Points column) ---
-    Story.append(Paragraph('Student Grading Results', h2))
+    Story.append(Paragraph('Student Grading Results', PDF_H2))
     Story.append(Spacer(1, 0.1 * inch))
 
-    pdf_df = df_export.copy()
-    
     # Filter out Grade_Points column
-    if 'Grade_Points' in pdf_df.columns:
-        pdf_df = pdf_df.drop(columns=['Grade_Points'])
-        
-    data = [pdf_df.columns.tolist()] 
-    for _, row in pdf_df.iterrows():
-        new_row = []
-        for item in row:
-            if pd.isna(item):
-                new_row.append('')
-            elif isinstance(item, (int, float)):
-                 new_row.append(int(item) if item == int(item) else round(item, 2))
-            else:
-                 new_row.append(str(item))
-        data.append(new_row)
+    pdf_cols = [col for col in columns if col != 'Grade_Points']
+
+    # Format column by column (one dtype decision per column, not per cell), then zip into rows
+    formatted_cols = [format_pdf_column(columns[col]) for col in pdf_cols]
+    data = [pdf_cols] + [list(row) for row in zip(*formatted_cols)]
     
     # Recalculate column widths based on the reduced number of columns
     total_cols = len(data[0])
@@ -299,18 +447,10 @@ def generate_pdf_from_data(df_export, summary_stats, academic_details, grade_poi
     
     col_widths = [doc.width * (w / 100) for w in percentage_widths]
     
-    table = Table(data, colWidths=col_widths)
+    # LongTable: the results table is the one that runs to many pages
+    table = LongTable(data, colWidths=col_widths)
     
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#003366')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.black)
-    ]))
+    table.setStyle(PDF_RESULTS_TABLE_STYLE)
     
     Story.append(table)
     Story.append(Spacer(1, 0.2 * inch))
@@ -318,33 +458,24 @@ def generate_pdf_from_data(df_export, summary_stats, academic_details, grade_poi
     # --- 4. Grading Summary Table (MODIFIED: Grade Point removed, Title bold) ---
     
     summary_flowables = []
-    summary_flowables.append(Paragraph(f'Grading Summary ({summary_stats["grading_method"].replace("_", " ").title()})', bold_left))
+    summary_flowables.append(Paragraph(f'Grading Summary ({summary_stats["grading_method"].replace("_", " ").title()})', PDF_BOLD_LEFT))
     summary_flowables.append(Spacer(1, 0.1 * inch))
 
     summary_data = [
-        [Paragraph('<b>Grade</b>', styles['Normal']), Paragraph('<b>Mark Range</b>', styles['Normal'])]
+        [Paragraph('<b>Grade</b>', PDF_NORMAL), Paragraph('<b>Mark Range</b>', PDF_NORMAL)]
     ]
-    # Sort by grade points
-    sorted_grades = sorted(summary_stats['grade_ranges'].keys(), key=lambda x: grade_point_map.get(x, -1), reverse=True)
-    for grade in sorted_grades:
-        summary_data.append([grade, summary_stats['grade_ranges'][grade]])
+    # Highest grade first
+    grade_ranges = summary_stats['grade_ranges']
+    for grade in SORTED_GRADES:
+        if grade in grade_ranges:
+            summary_data.append([grade, grade_ranges[grade]])
         
     # Set summary table to use a fixed portion of the page width
     summary_table_width = doc.width * 0.5
     summary_col_widths = [summary_table_width/2] * 2
     summary_table = Table(summary_data, colWidths=summary_col_widths)
     
-    summary_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#6699CC')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#E0E0E0')),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.black)
-    ]))
+    summary_table.setStyle(PDF_SUMMARY_TABLE_STYLE)
     
     summary_flowables.append(summary_table)
 
@@ -357,10 +488,10 @@ def generate_pdf_from_data(df_export, summary_stats, academic_details, grade_poi
     signatures = [
         ['', '', '', ''], # Spacer row for signature lines
         [
-            Paragraph("Generated By", sig_style), 
-            Paragraph("Verified By", sig_style), 
-            Paragraph("Dean Academic", sig_style), 
-            Paragraph("Principal", sig_style)
+            Paragraph("Generated By", PDF_SIGNATURE), 
+            Paragraph("Verified By", PDF_SIGNATURE), 
+            Paragraph("Dean Academic", PDF_SIGNATURE), 
+            Paragraph("Principal", PDF_SIGNATURE)
         ],
     ]
 
@@ -368,13 +499,7 @@ def generate_pdf_from_data(df_export, summary_stats, academic_details, grade_poi
     # The signature lines need a gap below the content and a height for the text
     sig_table = Table(signatures, colWidths=sig_col_widths, rowHeights=[0.5*inch, 0.2*inch])
 
-    sig_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('TOPPADDING', (0, 1), (-1, 1), 0),
-        ('BOTTOMPADDING', (0, 1), (-1, 1), 0),
-    ]))
+    sig_table.setStyle(PDF_SIGNATURE_TABLE_STYLE)
     
     # The signature block is added as the last element. ReportLab will automatically
     # push it to the next page if there is not enough space.
@@ -384,15 +509,162 @@ def generate_pdf_from_data(df_export, summary_stats, academic_details, grade_poi
 
     doc.build(Story)
     buffer.seek(0)
-    return buffer.getvalue()
+    return buffer
+
+
+# --- Excel Generation Logic ---
+def build_graded_workbook(columns, academic_details, grading_method, grade_ranges):
+    """
+    Builds the single-sheet graded workbook (institutional header, course details,
+    student results and grading summary) and returns it as a BytesIO.
+    """
+    student_cols = list(columns)
+    num_student_cols = len(student_cols)
+
+    # --- 1. Create Header Rows (Institutional Header, Subject Details, and Column Titles) for EXCEL ---
+    header_lines = [
+        'NATIONAL ENGINEERING COLLEGE, K.R. NAGAR, KOVILPATTI – 628 503',
+        '(An Autonomous Institution Affiliated to Anna University, Chennai)',
+        'NPTEL - Grade Fixing'
+    ]
+
+    # Column A of each header row: blank line, institutional header, blank line,
+    # course details block (Excel uses simple rows), blank line
+    header_first_col = [
+        '',
+        *header_lines,
+        '',
+        f"Academic Year: {academic_details['academic_year'].strip()}",
+        f"Subject Code: {academic_details['subject_code'].strip()}",
+        f"Subject Name: {academic_details['subject_name'].strip()}",
+        f"Total Number of Students: {academic_details['expected_total_students']}",
+        '',
+    ]
+
+    # One preallocated block for the whole header, then the Column Titles Row
+    header_rows = np.full((len(header_first_col) + 1, num_student_cols), '', dtype=object)
+    header_rows[:-1, 0] = header_first_col
+    header_rows[-1] = student_cols
+
+    # --- 2. Create Summary Table Rows (appended below student list) for EXCEL ---
+    # Plain padded lists, filled by position
+    def blank_row():
+        return [''] * num_student_cols
+
+    summary_start_idx = min(3, num_student_cols - 2) 
+    grade_col, range_col = summary_start_idx, summary_start_idx + 1
+    summary_rows = [blank_row(), blank_row()]
+
+    summary_title = blank_row()
+    summary_title[0] = f'--- Grading Summary ({grading_method.replace("_", " ").title()}) ---'
+    summary_rows.append(summary_title)
+
+    # Add header for the summary table (Grade and Mark Range)
+    summary_header = blank_row()
+    summary_header[grade_col] = 'Grade'
+    summary_header[range_col] = 'Mark Range'
+    summary_rows.append(summary_header)
+
+    # Add actual range data
+    for grade in SORTED_GRADES:
+        if grade not in grade_ranges:
+            continue
+        summary_row = blank_row()
+        summary_row[grade_col] = grade
+        summary_row[range_col] = grade_ranges[grade]
+        summary_rows.append(summary_row)
+
+    # --- 3. Write Header, Student Data, and Summary for EXCEL ---
+    # Missing student values are written as blank cells
+    student_values = []
+    for values in columns.values():
+        values = values.astype(object)
+        values[pd.isna(values)] = None
+        student_values.append(values.tolist())
+
+    # Stream the three blocks top-to-bottom straight into the sheet (no concat and
+    # no DataFrames for the header/summary rows); constant_memory flushes each row
+    # instead of holding the whole sheet (pandas' to_excel writes column-major,
+    # which constant_memory cannot accept). strings_to_urls is off so URL-like text
+    # stays a plain string, as openpyxl wrote it
+    output = io.BytesIO()
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True,
+                                            'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+                                            'strings_to_urls': False})
+    worksheet = workbook.add_worksheet('Graded_Results')
+    row_idx = 0
+    for row in header_rows.tolist():
+        worksheet.write_row(row_idx, 0, row)
+        row_idx += 1
+    # Per-student loop: bind the sheet limit and the bound write_row to locals
+    column_titles = header_rows[-1].tolist()
+    rows_per_sheet = EXCEL_SHEET_STUDENT_ROWS
+    write_row = worksheet.write_row
+    for i, row in enumerate(zip(*student_values)):
+        if i and i % rows_per_sheet == 0:
+            # Segment very large rosters across sheets, repeating the column titles
+            worksheet = workbook.add_worksheet(f'Graded_Results_{i // rows_per_sheet + 1}')
+            write_row = worksheet.write_row
+            write_row(0, 0, column_titles)
+            row_idx = 1
+        write_row(row_idx, 0, row)
+        row_idx += 1
+    for row in summary_rows:
+        worksheet.write_row(row_idx, 0, row)
+        row_idx += 1
+    workbook.close()
+    output.seek(0)
+    return output
+
+def export_graded_workbook(file_id, columns, academic_details, grading_method, grade_ranges):
+    """
+    Encodes the graded workbook off the request thread and stores it in the cache
+    under (file_id, 'xlsx'), clearing the pending marker either way.
+    """
+    try:
+        output = build_graded_workbook(columns, academic_details, grading_method, grade_ranges)
+        processed_files.set((file_id, 'xlsx'), output, read=True, expire=PROCESSED_FILE_TTL)
+    except Exception as e:
+        print(f"Excel generation failed for {file_id}: {e}")
+        raise
+    finally:
+        processed_files.delete((file_id, 'xlsx.pending'))
+
+def export_graded_pdf(file_id, columns, summary_stats, academic_details):
+    """
+    Renders the PDF report off the request thread and stores it in the cache as a
+    file under (file_id, 'pdf'), clearing the pending marker either way.
+    """
+    try:
+        # Stream the render buffer into the cache file as-is (no getvalue() copy)
+        pdf_buffer = generate_pdf_from_data(columns, summary_stats, academic_details)
+        processed_files.set((file_id, 'pdf'), pdf_buffer, read=True, expire=PROCESSED_FILE_TTL)
+    except Exception as e:
+        print(f"PDF generation failed for {file_id}: {e}")
+        raise
+    finally:
+        processed_files.delete((file_id, 'pdf.pending'))
 
+def submit_export(key, fn, *args):
+    """Runs an export in the background, tracking its future under the cache key it fills."""
+    future = export_executor.submit(fn, *args)
+    pending_exports[key] = future
+    future.add_done_callback(lambda _: pending_exports.pop(key, None))
 
-# --- API Endpoints (Unmodified) ---
+
+def cached_file_path(key):
+    """Returns the on-disk path of a file-backed cache entry, or None if it is missing or expired."""
+    handle = processed_files.get(key, read=True)
+    if handle is None:
+        return None
+    with handle:
+        return handle.name
+
+
+# --- API Endpoints ---
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
-    global grade_cutoffs
-    
     try:
         # Require expected values before processing
         expected_total = request.form.get('expected_total_students')
@@ -427,18 +699,25 @@ def upload_file():
         if not file.filename.lower().endswith(('.xlsx', '.xls')):
             return jsonify({'error': 'Invalid file format. Please upload an Excel file.'}), 400
 
-        df = pd.read_excel(file)
+        # Werkzeug already spools large uploads to a temp file; parse that stream in place
+        df = pd.read_excel(file.stream, engine=EXCEL_READ_ENGINE)
 
         # Basic required columns
         if 'Marks' not in df.columns:
             return jsonify({'error': 'Excel file must contain a "Marks" column'}), 400
 
-        name_col_found = next((col for col in ['Name', 'Student Name', 'Student', 'name'] if col in df.columns), None)
+        sheet_cols = frozenset(df.columns)
+        name_col_found = next((col for col in NAME_COLUMN_CANDIDATES if col in sheet_cols), None)
         if not name_col_found:
             return jsonify({'error': 'Excel file must contain a name column (e.g., "Name")'}), 400
 
         df.rename(columns={name_col_found: 'Name'}, inplace=True)
-        df['Marks'] = pd.to_numeric(df['Marks'], errors='coerce')
+        # Clean sheets already come back numeric; only coerce (slow, per element) when they don't
+        marks_col = df['Marks']
+        if pd.api.types.is_numeric_dtype(marks_col) and not pd.api.types.is_bool_dtype(marks_col):
+            df['Marks'] = marks_col.astype(np.float64)
+        else:
+            df['Marks'] = pd.to_numeric(marks_col, errors='coerce')
 
         # Attempt to find a subject column (case-insensitive 'subject' in the column name)
         subject_col_found = next((col for col in df.columns if 'subject' in col.lower()), None)
@@ -462,145 +741,88 @@ def upload_file():
 
 
         # Verify student count
-        file_student_count = int(df['Name'].dropna().shape[0])
+        file_student_count = int(df['Name'].count())  # non-missing names, no dropna() copy
         if file_student_count != expected_total:
             return jsonify({'error': f'Student count mismatch: expected {expected_total}, found {file_student_count}. Please correct and retry.'}), 400
 
         # Proceed with existing grading logic now that verification passed
-        valid_students_count = len(df.dropna(subset=['Marks']))
+        # One pass over Marks: the missing-value mask feeds the count, grading dispatch and summary stats
+        marks_arr = df['Marks'].to_numpy(dtype=np.float64, copy=False)
+        valid_mask = ~np.isnan(marks_arr)
+        valid_students_count = int(np.count_nonzero(valid_mask))
         grading_method = 'relative_grading' if valid_students_count > 30 else 'fixed_grading'
-        grading_function = apply_relative_grading if grading_method == 'relative_grading' else apply_fixed_grading
 
-        # Apply grading (functions return a Series of grade letters)
-        df['Grade'] = grading_function(df['Marks'])
-        df['Grade_Points'] = df['Grade'].map(GRADE_POINTS_MAP).fillna(0).astype(int)
+        # Apply grading on the marks array (functions return grade category codes)
+        if grading_method == 'relative_grading':
+            grade_codes, grade_cutoffs = apply_relative_grading(marks_arr)
+        else:
+            grade_codes, grade_cutoffs = apply_fixed_grading(marks_arr), None
+        grade_points = POINTS_BY_CODE[grade_codes]
+        df['Grade'] = pd.Categorical.from_codes(grade_codes, dtype=GRADE_CATEGORIES)
+        df['Grade_Points'] = grade_points
         
         # --- Generate Grading Summary ---
-        continuous_ranges = calculate_continuous_grade_ranges(df, grading_method)
+        continuous_ranges = calculate_continuous_grade_ranges(grading_method, grade_cutoffs)
         
-        # Summary statistics use raw marks
-        valid_marks = df['Marks'].dropna()
+        # Summary statistics use raw marks (valid marks only, selected with the mask above)
+        valid_marks = marks_arr[valid_mask]
         summary_stats = {
-            'count': int(valid_marks.count()),
-            'average': round(valid_marks.mean(), 2) if not valid_marks.empty else 0,
-            'max': int(valid_marks.max()) if not valid_marks.empty else 0,
-            'min': int(valid_marks.min()) if not valid_marks.empty else 0,
+            'count': valid_students_count,
+            'average': round(float(valid_marks.mean()), 2) if valid_students_count else 0,
+            'max': int(valid_marks.max()) if valid_students_count else 0,
+            'min': int(valid_marks.min()) if valid_students_count else 0,
             'grading_method': grading_method,
             'grade_ranges': continuous_ranges 
         }
 
         # --- Student Details for Frontend Display (keep Grade_Points here) ---
-        display_cols = ['Name', 'Marks', 'Grade', 'Grade_Points']
-        df_display = df[display_cols].copy()
-        df_display['Marks'] = df_display['Marks'].astype(object).where(df_display['Marks'].notna(), None)
-        student_details = df_display.to_dict(orient='records')
+        # Built from the arrays already in hand and zipped once; missing marks stay NaN,
+        # which orjson emits as null
+        names = df['Name'].tolist()
+        marks = marks_arr.tolist()
+        grades = LABELS_BY_CODE[grade_codes].tolist()
+        points = grade_points.tolist()
+        student_details = [
+            {'Name': n, 'Marks': m, 'Grade': g, 'Grade_Points': p}
+            for n, m, g, p in zip(names, marks, grades, points)
+        ]
         # ---------------------------------------------------------------------
 
         # Remove Normalized_Value column if present before writing output Excel
-        df_export = df.copy()
-        if 'Normalized_Value' in df_export.columns:
-            df_export = df_export.drop(columns=['Normalized_Value'])
-
-        student_cols = df_export.columns.tolist()
-        num_student_cols = len(student_cols)
-        
-        # --- 1. Create Header Rows (Institutional Header, Subject Details, and Column Titles) for EXCEL (Unmodified from previous version) ---
-        header_lines = [
-            'NATIONAL ENGINEERING COLLEGE, K.R. NAGAR, KOVILPATTI – 628 503',
-            '(An Autonomous Institution Affiliated to Anna University, Chennai)',
-            'NPTEL - Grade Fixing'
-        ]
-        
-        empty_pad_series = pd.Series([''] * num_student_cols, index=student_cols)
-        header_rows = []
-        header_rows.append(empty_pad_series.copy())
-        
-        for line in header_lines:
-            header_row = empty_pad_series.copy()
-            header_row[student_cols[0]] = line
-            header_rows.append(header_row)
-
-        header_rows.append(empty_pad_series.copy())
-        
-        # Course Details Block (Excel uses simple rows)
-        details_row_1 = empty_pad_series.copy()
-        details_row_1[student_cols[0]] = f"Academic Year: {academic_year.strip()}"
-        header_rows.append(details_row_1)
-
-        details_row_2 = empty_pad_series.copy()
-        details_row_2[student_cols[0]] = f"Subject Code: {expected_subject.strip()}" 
-        header_rows.append(details_row_2)
-        
-        details_row_3 = empty_pad_series.copy()
-        details_row_3[student_cols[0]] = f"Subject Name: {subject_name.strip()}"
-        header_rows.append(details_row_3)
-        
-        details_row_4 = empty_pad_series.copy()
-        details_row_4[student_cols[0]] = f"Total Number of Students: {expected_total}" 
-        header_rows.append(details_row_4)
-        
-        header_rows.append(empty_pad_series.copy())
-        
-        # Column Titles Row
-        column_header_row = pd.Series(student_cols, index=student_cols) 
-        header_rows.append(column_header_row)
-        
-        header_df = pd.DataFrame(header_rows)
-        header_df.columns = student_cols
-        
-        # --- 2. Create Summary Table Rows (appended below student list) for EXCEL ---
-        summary_start_idx = min(3, num_student_cols - 2) 
-        summary_rows = []
-        summary_rows.append(empty_pad_series.copy())
-        summary_rows.append(empty_pad_series.copy())
-
-        summary_title = empty_pad_series.copy()
-        summary_title[student_cols[0]] = f'--- Grading Summary ({grading_method.replace("_", " ").title()}) ---'
-        summary_rows.append(summary_title)
-        
-        # Add header for the summary table (Grade and Mark Range)
-        summary_header = empty_pad_series.copy()
-        summary_header[student_cols[summary_start_idx]] = 'Grade'
-        summary_header[student_cols[summary_start_idx + 1]] = 'Mark Range'
-        summary_rows.append(summary_header)
-        
-        # Add actual range data
-        for grade in sorted(continuous_ranges.keys(), key=lambda x: GRADE_POINTS_MAP.get(x, -1), reverse=True):
-            range_str = continuous_ranges[grade]
-            summary_row = empty_pad_series.copy()
-            summary_row[student_cols[summary_start_idx]] = grade
-            summary_row[student_cols[summary_start_idx + 1]] = range_str
-            summary_rows.append(summary_row)
-
-        summary_data_df = pd.DataFrame(summary_rows)
-        
-        # --- 3. Combine Header, Student Data, and Summary for EXCEL ---
-        df_combined = pd.concat([header_df, df_export, summary_data_df], ignore_index=True)
-        df_combined = df_combined.fillna('')
-
-        output = io.BytesIO()
-        df_combined.to_excel(output, index=False, header=False, sheet_name='Graded_Results', engine='openpyxl') 
-        output.seek(0)
+        # (dropped from the column dict, which shares the frame's arrays; no frame copy)
+        export_columns = columns_from_frame(df)
+        export_columns.pop('Normalized_Value', None)
 
         original_filename = secure_filename(file.filename)
         output_filename = f"{os.path.splitext(original_filename)[0]}_graded.xlsx"
 
-        file_id = str(uuid.uuid4())
+        file_id = secrets.token_urlsafe(16)  # 128 random bits, URL-safe
 
-        # Store file data and academic details
-        processed_files[file_id] = {
-            'data': output.getvalue(), 
+        academic_details = {
+            'academic_year': academic_year,
+            'subject_code': expected_subject,
+            'subject_name': subject_name,
+            'expected_total_students': expected_total
+        }
+
+        # Marks the workbook and PDF as on their way for any worker serving a download before they finish
+        processed_files.set((file_id, 'xlsx.pending'), True, expire=EXPORT_PENDING_TTL)
+        processed_files.set((file_id, 'pdf.pending'), True, expire=EXPORT_PENDING_TTL)
+
+        # Store file details and academic details
+        processed_files.set((file_id, 'meta'), {
             'filename': output_filename,
-            'dataframe': df_export, # Used for PDF and range calculations
+            'columns': export_columns, # Used for PDF and range calculations
             'grading_method': grading_method,
-            'academic_details': { 
-                'academic_year': academic_year,
-                'subject_code': expected_subject,
-                'subject_name': subject_name,
-                'expected_total_students': expected_total
-            },
+            'grade_cutoffs': grade_cutoffs,
+            'academic_details': academic_details,
             'summary_stats': summary_stats
-        }
+        }, expire=PROCESSED_FILE_TTL)
+
+        # Encode the workbook and render the PDF in the background, so neither download pays for it cold
+        submit_export((file_id, 'xlsx'), export_graded_workbook, file_id, export_columns, academic_details,
+                      grading_method, continuous_ranges)
+        submit_export((file_id, 'pdf'), export_graded_pdf, file_id, export_columns, summary_stats, academic_details)
 
         return jsonify({
             'message': 'File processed successfully. Output is a single sheet with header, results, and summary.',
@@ -620,18 +842,36 @@ def upload_file():
 def download_specific_file(file_id):
     """Downloads the processed Excel file."""
     try:
-        if file_id not in processed_files:
+        file_data = processed_files.get((file_id, 'meta'))
+        if file_data is None:
+            return jsonify({'error': 'File not found or has expired'}), 404
+
+        xlsx_key = (file_id, 'xlsx')
+        xlsx_path = cached_file_path(xlsx_key)
+        if xlsx_path is None:
+            pending = pending_exports.get(xlsx_key)
+            if pending is not None:
+                # Encoding in this process: wait for it
+                pending.result()
+            elif not processed_files.add((file_id, 'xlsx.pending'), True, expire=EXPORT_PENDING_TTL):
+                # Encoding in another worker: ask the client to retry shortly
+                return jsonify({'status': 'processing', 'message': 'Excel file is still being generated'}), 202, {'Retry-After': '1'}
+            else:
+                # Nobody is building it (evicted, or the background encode failed): build it now and keep it
+                export_graded_workbook(file_id, file_data['columns'], file_data['academic_details'],
+                                       file_data['grading_method'], file_data['summary_stats']['grade_ranges'])
+            xlsx_path = cached_file_path(xlsx_key)
+
+        if xlsx_path is None:
             return jsonify({'error': 'File not found or has expired'}), 404
         
-        file_data = processed_files[file_id]
-        buffer = io.BytesIO(file_data['data'])
-        buffer.seek(0)
-        
+        # Serve the cache's on-disk file by path: zero-copy sendfile, ETag and Range support
         return send_file(
-            buffer,
+            xlsx_path,
             mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
             as_attachment=True,
-            download_name=file_data['filename']
+            download_name=file_data['filename'],
+            conditional=True
         )
     
     except Exception as e:
@@ -644,36 +884,38 @@ def download_pdf(file_id):
     Generates and returns a PDF file containing all results and summary.
     """
     try:
-        if file_id not in processed_files:
+        file_info = processed_files.get((file_id, 'meta'))
+        if file_info is None:
             return jsonify({'error': 'File not found or has expired'}), 404
-        
-        file_info = processed_files[file_id]
-        
-        # Check cache first
-        if 'pdf_data' in file_info:
-             pdf_bytes = file_info['pdf_data']
-             pdf_filename = file_info['pdf_filename']
-        else:
-             # Generate the PDF
-             pdf_bytes = generate_pdf_from_data(
-                 file_info['dataframe'], 
-                 file_info['summary_stats'], 
-                 file_info['academic_details'],
-                 GRADE_POINTS_MAP
-             )
-             
-             # Cache the generated PDF data
-             pdf_filename = file_info['filename'].replace('.xlsx', '.pdf')
-             processed_files[file_id]['pdf_data'] = pdf_bytes
-             processed_files[file_id]['pdf_filename'] = pdf_filename
-        
-        buffer = io.BytesIO(pdf_bytes)
-        
+
+        # The PDF is rendered in the background right after upload
+        pdf_key = (file_id, 'pdf')
+        pdf_path = cached_file_path(pdf_key)
+        if pdf_path is None:
+            pending = pending_exports.get(pdf_key)
+            if pending is not None:
+                # Rendering in this process: wait for it
+                pending.result()
+            elif not processed_files.add((file_id, 'pdf.pending'), True, expire=EXPORT_PENDING_TTL):
+                # Rendering in another worker: ask the client to retry shortly
+                return jsonify({'status': 'processing', 'message': 'PDF is still being generated'}), 202, {'Retry-After': '1'}
+            else:
+                # Nobody is rendering it (evicted, or the background render failed): render it now and keep it
+                export_graded_pdf(file_id, file_info['columns'], file_info['summary_stats'], file_info['academic_details'])
+            pdf_path = cached_file_path(pdf_key)
+
+        if pdf_path is None:
+            return jsonify({'error': 'File not found or has expired'}), 404
+
+        pdf_filename = file_info['filename'].replace('.xlsx', '.pdf')
+
+        # Same as the workbook: serve the cached file by path (sendfile, ETag and Range support)
         return send_file(
-            buffer,
+            pdf_path,
             mimetype='application/pdf',
             as_attachment=True,
-            download_name=pdf_filename
+            download_name=pdf_filename,
+            conditional=True
         )
     
     except Exception as e:
@@ -687,19 +929,15 @@ def get_grade_ranges(file_id):
     Returns the continuous mark ranges for each grade based on cutoffs.
     """
     try:
-        if file_id not in processed_files:
+        file_info = processed_files.get((file_id, 'meta'))
+        if file_info is None:
             return jsonify({'error': 'File data not found. Upload a file first.'}), 404
         
-        file_info = processed_files[file_id]
-        grading_method = file_info['grading_method']
-        
-        # Recalculate ranges to ensure global state consistency
-        continuous_ranges = calculate_continuous_grade_ranges(file_info['dataframe'], grading_method)
-        
+        # Ranges were computed from this file's own cutoffs at upload; serve them as stored
         return jsonify({
             'file_id': file_id,
-            'grading_method': grading_method,
-            'grade_ranges': continuous_ranges
+            'grading_method': file_info['grading_method'],
+            'grade_ranges': file_info['summary_stats']['grade_ranges']
         }), 200
     
     except Exception as e:
@@ -716,5 +954,6 @@ def too_large(e):
     return jsonify({'error': 'File too large. Maximum size is 16MB.'}), 413
 
 if __name__ == '__main__':
+    # Development server only; production runs under gunicorn via wsgi.py (see gunicorn_conf.py)
     print("Starting Student Grading System API...")
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    app.run(debug=os.environ.get('FLASK_DEBUG') == '1', host='0.0.0.0', port=5000)
\ No newline at end of file
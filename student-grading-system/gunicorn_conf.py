@@ -0,0 +1,21 @@
+# Gunicorn configuration for the Student Grading System API.
+# Run from this directory:  gunicorn -c gunicorn_conf.py wsgi:application
+import multiprocessing
+import os
+
+bind = os.environ.get('GRADING_BIND', '0.0.0.0:5000')
+
+# One worker process per core: uploads are CPU-bound (parse, grade, encode Excel),
+# so separate processes let concurrent uploads run in parallel. Processed files
+# live in the shared disk cache, so any worker can serve any download.
+workers = int(os.environ.get('GRADING_WORKERS', multiprocessing.cpu_count()))
+
+# A few threads per worker keep cheap requests (downloads, grade ranges) from
+# queueing behind an upload. Threads do share module state: pending_exports is
+# only touched by single dict operations (atomic under the GIL), and the disk
+# cache does its own locking, with .pending markers guarding each export.
+worker_class = 'gthread'
+threads = int(os.environ.get('GRADING_THREADS', 4))
+
+# Large workbooks and PDFs can take a while to build
+timeout = 120